@@ -7,27 +7,143 @@
 
 """Module for synchronization of Jira worklogs between different instances."""
 
-import itertools
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import queue
 import re
-from dataclasses import dataclass
-from datetime import date, timedelta
-from typing import IO, Dict, Iterator, Optional, Tuple, Union
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, as_completed, wait
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    DefaultDict,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import arrow
 import click
-import jira
 import requests
-from jira import JIRA
-from jira.client import ResultList
-from pydantic import BaseModel, Field, HttpUrl, ValidationError
-from requests import HTTPError
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl, ValidationError
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+if TYPE_CHECKING:
+    # jira is imported only when connecting to Jira, importing it takes a significant part of CLI startup time.
+    import jira
+    from jira import JIRA
+    from jira.client import ResultList
 
 __version__ = "1.1.0"
 
+MAX_WORKERS = 5
+"""Maximum number of concurrent requests sent to a Jira or Tempo instance, Tempo recommends at most 5 per second."""
+
+TEMPO_TIMEOUT = 30.0
+"""Timeout of Tempo API requests in seconds."""
+
+TEMPO_RATE_LIMIT = 5
+"""Maximum number of requests sent to Tempo per second, as recommended by Tempo."""
+
+TEMPO_PAGE_SIZE = 1000
+"""Number of worklogs requested per page, the maximum allowed by Tempo API version 3."""
+
+CACHE_DIRECTORY = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "jira_timemachine")
+"""Directory of cached API responses."""
+
+RESPONSE_CACHE_MAX_AGE = 3600.0
+"""Number of seconds for which cached API responses are kept for revalidation."""
+
+SOURCE_CACHE_TTL = 300.0
+"""Default number of seconds for which `timemachine` reuses worklogs fetched from the source Jira."""
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def prefetch(items: Iterator[T], size: int = 2) -> Iterator[T]:
+    """Yield from *items* while a background thread produces up to *size* next items.
+
+    It's used to request further pages of API results while the current page is processed. Exceptions raised by *items*
+    are reraised in the consuming thread.
+    """
+    buffer: "queue.Queue[Tuple[bool, Any]]" = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(entry: Tuple[bool, Any]) -> bool:
+        """Put *entry* in the buffer unless the consumer stopped, return False if it did."""
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        """Produce all items followed by a final entry with an exception or None."""
+        try:
+            for item in items:
+                if not put((True, item)):
+                    return
+        except BaseException as exc:
+            put((False, exc))
+        else:
+            put((False, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            is_item, value = buffer.get()
+            if not is_item:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stop.set()
+
+
+def map_bounded(
+    executor: Executor, function: Callable[[T], R], items: Iterable[T], window: int
+) -> Iterator[Tuple[T, R]]:
+    """Yield *items* with results of *function* called for them in *executor*, in order of completion.
+
+    At most *window* calls are pending at once, so a long iterator of *items* is consumed as results are yielded.
+    """
+    pending: Dict[Future[R], T] = {}
+    for item in items:
+        if len(pending) >= window:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+        pending[executor.submit(function, item)] = item
+    for future in as_completed(pending):
+        yield pending[future], future.result()
+
 
 class BaseJiraConfig(BaseModel):
     """Common Jira configuration."""
 
+    model_config = ConfigDict(frozen=True, extra="forbid", str_strip_whitespace=True)
+
     url: HttpUrl
     email: str = Field("", description="Jira user email.")
     jira_token: str
@@ -56,6 +172,8 @@ class DestinationJiraConfig(BaseJiraConfig):
 class Config(BaseModel):
     """Timemachine configuration."""
 
+    model_config = ConfigDict(frozen=True, extra="forbid", str_strip_whitespace=True)
+
     source_jira: SourceJiraConfig
     destination_jira: DestinationJiraConfig
     issue_map: Dict[str, str] = Field(
@@ -65,7 +183,11 @@ class Config(BaseModel):
     )
 
 
-@dataclass
+TEMPO_ATTRIBUTES: list = []
+"""Work attributes of written Tempo worklogs, shared by all of them since nothing modifies it."""
+
+
+@dataclass(slots=True)
 class Worklog:
     """JIRA or Tempo worklog."""
 
@@ -78,7 +200,8 @@ class Worklog:
     """
     tempo_id: Optional[int]
     """Tempo worklog ID or None for plain Jira worklogs."""
-    started: arrow.Arrow
+    started: datetime
+    """Timezone-aware start time."""
     time_spent_seconds: int
     description: str
     author: str
@@ -86,63 +209,282 @@ class Worklog:
 
     def to_tempo(self) -> dict:
         """Return self as dict for use in Tempo API."""
+        started = self.started.isoformat()  # e.g. 2018-11-16T15:12:13+00:00, sliced instead of formatting it twice
         return {
-            "attributes": [],
+            "attributes": TEMPO_ATTRIBUTES,
             "authorAccountId": self.author,
             "description": self.description,
             "issueKey": self.issue,
-            "startDate": self.started.format("YYYY-MM-DD"),
-            "startTime": self.started.format("HH:mm:ss"),
+            "startDate": started[:10],
+            "startTime": started[11:19],
             "timeSpentSeconds": self.time_spent_seconds,
         }
 
 
+class TempoRetry(Retry):
+    """Retry policy required by Tempo API.
+
+    Pauses between retries grow linearly, so with ``backoff_factor=5`` server errors are retried after 5, 10 and 15
+    seconds; rate limited requests are retried after the time requested by the server if it's specified. POST requests
+    are retried only when rate limited: Tempo didn't process them then, while after other errors they might have created
+    a worklog.
+    """
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        """Return whether the request should be retried after receiving *status_code*."""
+        if method == "POST" and status_code == 429:
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def get_backoff_time(self) -> float:
+        """Return the number of seconds to wait before the next retry."""
+        return min(self.backoff_max, self.backoff_factor * len(self.history))
+
+
+def make_session() -> requests.Session:
+    """Return a session keeping enough connections alive for concurrent requests and retrying as Tempo requires.
+
+    After the last retry, the failed response is returned, so its content can be reported.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=TempoRetry(
+            total=3,
+            backoff_factor=5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        ),
+    )
+    session.mount("https://", adapter)
+    session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip"})
+    return session
+
+
+@functools.lru_cache(maxsize=None)
+def tempo_session() -> requests.Session:
+    """Return the session shared by Tempo clients, so clients of the source and destination reuse connections."""
+    return make_session()
+
+
+@functools.lru_cache(maxsize=None)
+def response_cache() -> ResponseCache:
+    """Return the response cache shared by Tempo clients, so an unwritable cache directory is reported once."""
+    return ResponseCache(CACHE_DIRECTORY)
+
+
+class BearerAuth(requests.auth.AuthBase):
+    """Bearer token authentication, set per request so sessions can be shared by clients of different services."""
+
+    def __init__(self, token: str) -> None:
+        """Store the *token*."""
+        self.token = token
+
+    def __call__(self, request: requests.PreparedRequest) -> requests.PreparedRequest:
+        """Add the authorization header to the *request*."""
+        request.headers["Authorization"] = "Bearer %s" % self.token
+        return request
+
+
+class RateLimiter:
+    """Token bucket limiting the rate of requests, shared by all threads sending them."""
+
+    def __init__(self, rate: float) -> None:
+        """Allow *rate* requests per second, with bursts of up to that many requests."""
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Wait until another request is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # A token is reserved even if unavailable, so each waiting thread waits for a later token.
+            self._tokens -= 1
+            delay = -self._tokens / self.rate
+        if delay > 0:
+            time.sleep(delay)
+
+
+def remove_expired_files(directory: str, max_age: float) -> None:
+    """Remove files in *directory* which were not modified for *max_age* seconds, keeping its subdirectories."""
+    expired = time.time() - max_age
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < expired:
+                os.unlink(entry.path)
+        except OSError:
+            # might be already removed by another run
+            continue
+
+
+class ResponseCache:
+    """Disk cache of response bodies with their ETags, kept for *max_age* seconds after they are written.
+
+    Cached bodies are used only after the server confirms with 304 Not Modified that they are up to date, so the cache
+    never returns stale data. URLs contain the requested dates, so expired responses are removed when new ones are
+    cached.
+    """
+
+    def __init__(self, directory: str, max_age: float = RESPONSE_CACHE_MAX_AGE) -> None:
+        """Store cached responses in *directory*, created on first write."""
+        self.directory = directory
+        self.max_age = max_age
+        self.writable = True
+
+    def _path(self, url: str) -> str:
+        """Return the path of the file caching the response for *url*."""
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest())
+
+    def get(self, url: str) -> Optional[Tuple[str, bytes]]:
+        """Return the ETag and body of the cached response for *url*, or None if it's not cached or expired."""
+        path = self._path(url)
+        try:
+            if time.time() - os.path.getmtime(path) >= self.max_age:
+                os.unlink(path)
+                return None
+            with open(path, "rb") as cache_file:
+                etag, _, body = cache_file.read().partition(b"\n")
+        except OSError:
+            return None
+        return etag.decode(), body
+
+    def set(self, url: str, etag: str, body: bytes) -> None:
+        """Cache the response *body* with *etag* for *url*; failing to write the cache is not an error.
+
+        After the first failure no more responses are written, so an unwritable directory is reported once.
+        """
+        if not self.writable:
+            return
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=self.directory, delete=False) as cache_file:
+                cache_file.write(etag.encode() + b"\n" + body)
+            os.replace(cache_file.name, self._path(url))
+        except OSError as exc:
+            self.writable = False
+            click.echo("Cannot cache responses in {0}: {1}".format(self.directory, exc), err=True)
+            return
+        remove_expired_files(self.directory, self.max_age)
+
+
+class WorklogCache:
+    """Disk cache of worklog lists, valid for *ttl* seconds after they are written.
+
+    Keys contain the first day of worklogs, so expired lists are removed when new ones are cached.
+    """
+
+    def __init__(self, directory: str, ttl: float) -> None:
+        """Store cached worklogs in *directory*, created on first write."""
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, key: str) -> str:
+        """Return the path of the file caching worklogs for *key*."""
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def get(self, key: str) -> Optional[List[Worklog]]:
+        """Return the worklogs cached for *key*, or None if they're not cached or expired."""
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) >= self.ttl:
+                os.unlink(path)
+                return None
+            with open(path, "rb") as cache_file:
+                rows = json.load(cache_file)
+            return [Worklog(**{**row, "started": datetime.fromisoformat(row["started"])}) for row in rows]
+        except (OSError, TypeError, KeyError, ValueError):
+            # Rows written by another version of `Worklog` are fetched again.
+            return None
+
+    def set(self, key: str, worklogs: List[Worklog]) -> None:
+        """Cache *worklogs* for *key*; failing to write the cache is not an error."""
+        rows = [{**asdict(worklog), "started": worklog.started.isoformat()} for worklog in worklogs]
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=self.directory, delete=False) as cache_file:
+                json.dump(rows, cache_file)
+            os.replace(cache_file.name, self._path(key))
+        except OSError as exc:
+            click.echo("Cannot cache worklogs: {0}".format(exc), err=True)
+        remove_expired_files(self.directory, self.ttl)
+
+
 class TempoClient:
     """A client for Tempo Cloud APIs.
 
     See <https://tempo-io.github.io/tempo-api-docs/> for the API documentation.
     """
 
-    def __init__(self, tempo_token: str, account_id: str) -> None:
-        """Prepare session for Tempo API requests."""
+    def __init__(
+        self,
+        tempo_token: str,
+        account_id: str,
+        session: Optional[requests.Session] = None,
+        cache: Optional["ResponseCache"] = None,
+    ) -> None:
+        """Prepare session for Tempo API requests.
+
+        :param session: session used for requests, possibly shared with other clients; a new one is created by default
+        :param cache: cache of worklog pages revalidated with their ETags, pages are not cached by default
+        """
         self.account_id = account_id
-        self.session = requests.Session()
-        self.session.headers.update({"Authorization": "Bearer %s" % tempo_token})
-
-    def get_worklogs(self, from_date: date, single_user: bool = True) -> Iterator[Worklog]:
+        self.session = session or make_session()
+        self.auth = BearerAuth(tempo_token)
+        self.cache = cache
+        self.rate_limiter = RateLimiter(TEMPO_RATE_LIMIT)
+
+    def get_worklogs(
+        self, from_date: date, single_user: bool = True, issue_keys: Optional[List[str]] = None
+    ) -> Iterator[Worklog]:
         """Return all recent worklogs for the specified user.
 
+        :param issue_keys: if given, only worklogs of these issues are requested
         :returns: yields Worklog instances
         """
-        if single_user:
-            url = "https://api.tempo.io/core/3/worklogs/user/%s?from=%s&to=%s" % (
+        search = None
+        if issue_keys is not None:
+            url = "https://api.tempo.io/core/3/worklogs/search?limit=%d" % TEMPO_PAGE_SIZE
+            search = {"from": str(from_date), "to": str(date.today()), "issue": issue_keys}
+            if single_user:
+                search["authorIds"] = [self.account_id]
+        elif single_user:
+            url = "https://api.tempo.io/core/3/worklogs/user/%s?from=%s&to=%s&limit=%d" % (
                 self.account_id,
                 from_date,
                 date.today(),
+                TEMPO_PAGE_SIZE,
             )
         else:
-            url = "https://api.tempo.io/core/3/worklogs?from=%s&to=%s" % (from_date, date.today())
-        while url:
-            res = self.session.get(
-                url,
-                allow_redirects=False,
+            url = "https://api.tempo.io/core/3/worklogs?from=%s&to=%s&limit=%d" % (
+                from_date,
+                date.today(),
+                TEMPO_PAGE_SIZE,
             )
-            try:
-                res.raise_for_status()
-            except Exception:
-                click.echo(res.content)
-                raise
-            response_data = res.json()
+        for response_data in prefetch(self._pages(url, search)):
             for row in response_data["results"]:
                 if single_user and row["author"]["accountId"] != self.account_id:
                     continue
                 try:
                     yield Worklog(
+                        # int() raises TypeError for null Jira worklog IDs, such rows are reported below.
                         id=int(row["jiraWorklogId"]),
-                        tempo_id=int(row["tempoWorklogId"]),
+                        tempo_id=row["tempoWorklogId"],
                         author=row["author"]["accountId"],
-                        started=arrow.get("{startDate} {startTime}".format(**row)),
-                        time_spent_seconds=int(row["timeSpentSeconds"]),
+                        # Tempo API times have no timezone, like arrow we assume UTC.
+                        started=datetime.fromisoformat(f"{row['startDate']}T{row['startTime']}").replace(
+                            tzinfo=timezone.utc
+                        ),
+                        time_spent_seconds=row["timeSpentSeconds"],
                         issue=row["issue"]["key"],
                         description=row["description"],
                     )
@@ -151,8 +493,56 @@ class TempoClient:
                     click.echo(msg, err=True)
                     continue
 
+    def _pages(self, url: Optional[str], search: Optional[dict] = None) -> Iterator[dict]:
+        """Yield response data of all pages of results starting from *url*.
+
+        :param search: search parameters POSTed for each page, pages are requested with GET if they are not given
+        """
+        while url:
+            if search is None:
+                response_data = self._get_page(url)
+            else:
+                self.rate_limiter.acquire()
+                res = self.session.post(
+                    url,
+                    json=search,
+                    allow_redirects=False,
+                    auth=self.auth,
+                    timeout=TEMPO_TIMEOUT,
+                )
+                self._raise_for_status(res)
+                response_data = res.json()
+            yield response_data
             url = response_data["metadata"].get("next")
 
+    def _get_page(self, url: str) -> dict:
+        """Return response data of the page at *url*, revalidating the cached page if available."""
+        cached = self.cache.get(url) if self.cache is not None else None
+        self.rate_limiter.acquire()
+        res = self.session.get(
+            url,
+            allow_redirects=False,
+            auth=self.auth,
+            timeout=TEMPO_TIMEOUT,
+            headers={"If-None-Match": cached[0]} if cached else None,
+        )
+        if cached and res.status_code == 304:
+            return json.loads(cached[1])
+        self._raise_for_status(res)
+        etag = res.headers.get("ETag")
+        if self.cache is not None and etag:
+            self.cache.set(url, etag, res.content)
+        return res.json()
+
+    @staticmethod
+    def _raise_for_status(res: requests.Response) -> None:
+        """Raise `HTTPError` for an error response, showing its content."""
+        try:
+            res.raise_for_status()
+        except Exception:
+            click.echo(res.content)
+            raise
+
     def update_worklog(self, worklog: Worklog) -> None:
         """Update the specified worklog.
 
@@ -160,32 +550,62 @@ class TempoClient:
         """
         if worklog.tempo_id is None:
             raise ValueError("The worklog to update must have a Tempo ID")
-        res = self.session.put(b"https://api.tempo.io/core/3/worklogs/%d" % worklog.tempo_id, json=worklog.to_tempo())
-        try:
-            res.raise_for_status()
-        except Exception:
-            click.echo(res.content)
-            raise
+        self.rate_limiter.acquire()
+        res = self.session.put(
+            f"https://api.tempo.io/core/3/worklogs/{worklog.tempo_id}",
+            json=worklog.to_tempo(),
+            auth=self.auth,
+            timeout=TEMPO_TIMEOUT,
+        )
+        self._raise_for_status(res)
 
     def post_worklog(self, worklog: Worklog) -> None:
         """Upload a new worklog.
 
         :param worklog: new worklog data
         """
-        res = self.session.post(b"https://api.tempo.io/core/3/worklogs", json=worklog.to_tempo())
-        try:
-            res.raise_for_status()
-        except HTTPError:
-            click.echo(res.content)
+        self.post_tempo_dict(worklog.to_tempo())
+
+    def post_tempo_dict(self, data: dict) -> None:
+        """Upload a new worklog.
+
+        :param data: new worklog data in the Tempo API format, as returned by `Worklog.to_tempo`
+        """
+        self.rate_limiter.acquire()
+        res = self.session.post(
+            "https://api.tempo.io/core/3/worklogs",
+            json=data,
+            auth=self.auth,
+            timeout=TEMPO_TIMEOUT,
+        )
+        self._raise_for_status(res)
+
+
+ACCOUNT_IDS: Dict[Tuple[str, str, str], str] = {}
+"""Cache of Jira account IDs by Jira URL, email and token."""
 
 
 class BaseJIRAClient:
     """A client for JIRA API."""
 
     def __init__(self, config: BaseJiraConfig) -> None:
-        """Initialize with credentials from the *config* dict."""
-        self._jira = JIRA(str(config.url), basic_auth=(config.email, config.jira_token))
-        self.account_id: str = self._jira.myself()["accountId"]
+        """Initialize with credentials from the *config* dict.
+
+        Jira is not accessed if the account ID for these credentials is already known.
+        """
+        self._config = config
+        key = (str(config.url), config.email, config.jira_token)
+        account_id = ACCOUNT_IDS.get(key)
+        if account_id is None:
+            account_id = ACCOUNT_IDS[key] = self._jira.myself()["accountId"]
+        self.account_id: str = account_id
+
+    @functools.cached_property
+    def _jira(self) -> JIRA:
+        """Connection to Jira, created on first use."""
+        from jira import JIRA
+
+        return JIRA(str(self._config.url), basic_auth=(self._config.email, self._config.jira_token))
 
 
 class JIRAClient(BaseJIRAClient):
@@ -194,72 +614,215 @@ class JIRAClient(BaseJIRAClient):
     _ISSUE_JQL = 'project = {project_key} AND updated >= "{0}" ORDER BY key ASC'
     """JQL query format for listing all issues with worklogs to read."""
 
+    _ISSUE_ID_JQL = "project = {project_key} AND id in ({0})"
+    """JQL query format for finding project issues with the given IDs."""
+
+    _ISSUES_PAGE_SIZE = 1000
+    """Number of issues requested per page, Jira returns fewer if its configured maximum is lower."""
+
+    _WORKLOG_LIST_BATCH = 1000
+    """Maximum number of worklogs requested at once, as limited by Jira API."""
+
     def __init__(self, config: SourceJiraConfig) -> None:
         """Initialize with credentials from the *config* dict."""
         super().__init__(config)
         self._project_key = config.project_key
 
-    def _issues(self, query: str) -> Iterator[jira.Issue]:
-        """Issues iterator."""
-        issue_index = 1
-        max_results = 50
+    def _issues(self, query: str, use_post: bool = False) -> Iterator[jira.Issue]:
+        """Issues iterator, sending *query* in the request body if *use_post* is True, as long queries require."""
+        for search_results in prefetch(self._issue_pages(query, use_post)):
+            yield from search_results
+
+    def _issue_pages(self, query: str, use_post: bool) -> Iterator[ResultList]:
+        """Yield pages of issues matching *query*."""
+        if self._jira._is_cloud:
+            return self._issue_token_pages(query, use_post)
+        return self._issue_index_pages(query, use_post)
+
+    def _issue_token_pages(self, query: str, use_post: bool) -> Iterator[ResultList]:
+        """Yield pages of issues matching *query*, following next page tokens as required by Jira Cloud."""
+        from jira.client import ResultList
+
+        next_page_token = None
         while True:
-            search_results = self._jira.search_issues(
+            search_results = self._jira.enhanced_search_issues(
                 jql_str=query,
-                startAt=issue_index,
-                maxResults=max_results,
+                nextPageToken=next_page_token,
+                maxResults=self._ISSUES_PAGE_SIZE,
+                fields=["summary"],  # only issue IDs and keys are used and these are always returned
                 json_result=False,
+                use_post=use_post,
             )
             # We do not return json response.
             assert isinstance(search_results, ResultList)
-            for issue in search_results:
-                yield issue
-            issue_index += max_results
-            if len(search_results) < max_results:
+            yield search_results
+            next_page_token = search_results.nextPageToken
+            if not next_page_token:
                 return
 
+    def _issue_index_pages(self, query: str, use_post: bool) -> Iterator[ResultList]:
+        """Yield pages of issues matching *query*, requesting them by index as Jira Server and Data Center do.
+
+        The first page tells the total number of issues and the page size allowed by Jira, the other pages are then
+        requested concurrently.
+        """
+        first_page = self._issue_page(query, 0, self._ISSUES_PAGE_SIZE, use_post)
+        yield first_page
+        page_size = len(first_page)
+        if not first_page or page_size >= first_page.total:
+            return
+        if page_size < self._ISSUES_PAGE_SIZE:
+            # Jira limits page size to its configured maximum, continue with pages of the size it returned.
+            click.echo(
+                "Jira returned {0} of {1} requested issues per page".format(page_size, self._ISSUES_PAGE_SIZE),
+                err=True,
+            )
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            yield from executor.map(
+                lambda issue_index: self._issue_page(query, issue_index, page_size, use_post),
+                range(page_size, first_page.total, page_size),
+            )
+
+    def _issue_page(self, query: str, issue_index: int, max_results: int, use_post: bool) -> ResultList:
+        """Return the page of issues matching *query* starting at *issue_index*."""
+        from jira.client import ResultList
+
+        search_results = self._jira.search_issues(
+            jql_str=query,
+            startAt=issue_index,
+            maxResults=max_results,
+            fields=["summary"],  # only issue IDs and keys are used and these are always returned
+            json_result=False,
+            use_post=use_post,
+        )
+        # We do not return json response.
+        assert isinstance(search_results, ResultList)
+        return search_results
+
+    def _issue_worklogs(self, from_date: date) -> Iterator[Worklog]:
+        """Yield worklogs of recently updated project issues, requesting them issue by issue concurrently."""
+        issues = self._issues(self._ISSUE_JQL.format(from_date, project_key=self._project_key))
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for issue, jira_worklogs in map_bounded(executor, self._jira.worklogs, issues, 2 * MAX_WORKERS):
+                for jira_worklog in jira_worklogs:
+                    yield jira_worklog_to_worklog(jira_worklog.raw, issue.key)
+
+    def _updated_worklog_ids(self, since_ms: int) -> List[int]:
+        """Return IDs of all worklogs updated since *since_ms* (milliseconds since the epoch)."""
+        worklog_ids: List[int] = []
+        url = self._jira._get_url("worklog/updated")
+        params: Optional[Dict[str, int]] = {"since": since_ms}
+        while True:
+            response_data = self._jira._session.get(url, params=params).json()
+            worklog_ids.extend(value["worklogId"] for value in response_data["values"])
+            if response_data.get("lastPage", True):
+                return worklog_ids
+            # The next page URL already contains all query parameters.
+            url = response_data["nextPage"]
+            params = None
+
+    def _list_worklogs(self, worklog_ids: List[int]) -> Iterator[Worklog]:
+        """Yield project worklogs with the given IDs, requesting them in batches."""
+        # Issue keys by issue ID, None for issues from other projects, kept for all batches.
+        issue_keys: Dict[str, Optional[str]] = {}
+        for start in range(0, len(worklog_ids), self._WORKLOG_LIST_BATCH):
+            batch = worklog_ids[start : start + self._WORKLOG_LIST_BATCH]
+            rows = self._jira._get_json("worklog/list", params={"ids": batch}, use_post=True)
+            new_issue_ids = {row["issueId"] for row in rows}.difference(issue_keys)
+            if new_issue_ids:
+                # Worklogs are listed for all projects, so only those from issues found by this query are yielded.
+                issue_keys.update(dict.fromkeys(new_issue_ids))
+                query = self._ISSUE_ID_JQL.format(", ".join(sorted(new_issue_ids)), project_key=self._project_key)
+                # A batch can list a thousand issue IDs, too long for the query string of a GET request.
+                issue_keys.update((issue.id, issue.key) for issue in self._issues(query, use_post=True))
+            for row in rows:
+                issue_key = issue_keys.get(row["issueId"])
+                if issue_key is not None:
+                    yield jira_worklog_to_worklog(row, issue_key)
+
+    def _bulk_worklogs(self, since_ms: int) -> Iterator[Worklog]:
+        """Return project worklogs updated since *since_ms* using the bulk worklog endpoints.
+
+        Worklog IDs are requested before returning, so `jira.JIRAError` is raised here if the endpoint is unavailable.
+        """
+        return self._list_worklogs(self._updated_worklog_ids(since_ms))
+
     def get_worklogs(self, from_date: date, single_user: bool = True) -> Iterator[Worklog]:
         """Return all recent worklogs for the specified user.
 
         :returns: yields Worklog instances
         """
-        for issue in self._issues(self._ISSUE_JQL.format(from_date, project_key=self._project_key)):
-            for jira_worklog in self._jira.worklogs(issue):
-                worklog = Worklog(
-                    id=int(jira_worklog.id),
-                    tempo_id=None,
-                    author=jira_worklog.author.accountId,
-                    time_spent_seconds=int(jira_worklog.timeSpentSeconds),
-                    issue=issue.key,
-                    started=arrow.get(jira_worklog.started),
-                    description=getattr(jira_worklog, "comment", ""),
-                )
-                if single_user and worklog.author != self.account_id:
-                    continue
-                yield worklog
+        from jira import JIRAError
 
+        since_ms = int(datetime(from_date.year, from_date.month, from_date.day, tzinfo=timezone.utc).timestamp() * 1000)
+        try:
+            worklogs = self._bulk_worklogs(since_ms)
+        except JIRAError as exc:
+            if exc.status_code != 403:
+                raise
+            click.echo("Bulk worklog API is not permitted, requesting worklogs per issue", err=True)
+            worklogs = self._issue_worklogs(from_date)
+        for worklog in worklogs:
+            if single_user and worklog.author != self.account_id:
+                continue
+            yield worklog
 
-def get_tempo_client(config: BaseJiraConfig) -> TempoClient:
-    """Return a Tempo client for the source of worklogs specified in *config*."""
-    jira_client = BaseJIRAClient(config)
-    return TempoClient(config.tempo_token, jira_client.account_id)
+
+def jira_worklog_to_worklog(row: dict, issue_key: str) -> Worklog:
+    """Return a `Worklog` for a worklog JSON object returned by Jira API.
+
+    :param row: worklog JSON object
+    :param issue_key: key of the worklog issue (Jira API provides only its ID)
+    """
+    return Worklog(
+        id=int(row["id"]),  # Jira returns IDs as strings
+        tempo_id=None,
+        author=row["author"]["accountId"],
+        time_spent_seconds=row["timeSpentSeconds"],
+        issue=issue_key,
+        started=datetime.fromisoformat(row["started"]),
+        description=row.get("comment", ""),
+    )
 
 
-def get_client(config: SourceJiraConfig) -> Union[TempoClient, JIRAClient]:
-    """Return a client for the source of worklogs specified in *config*."""
+TEMPO_CLIENTS: Dict[Tuple[str, str, bool], TempoClient] = {}
+"""Tempo clients by Tempo token, account ID and use of the response cache, so configurations of the same user share the
+client rate limit."""
+
+
+def get_tempo_client(config: BaseJiraConfig, cache: bool = True) -> TempoClient:
+    """Return a Tempo client for the source of worklogs specified in *config*, caching responses if *cache* is True."""
+    jira_client = BaseJIRAClient(config)
+    key = (config.tempo_token, jira_client.account_id, cache)
+    tempo_client = TEMPO_CLIENTS.get(key)
+    if tempo_client is None:
+        tempo_client = TEMPO_CLIENTS[key] = TempoClient(
+            config.tempo_token,
+            jira_client.account_id,
+            session=tempo_session(),
+            cache=response_cache() if cache else None,
+        )
+    return tempo_client
+
+
+def get_client(config: SourceJiraConfig, cache: bool = True) -> Union[TempoClient, JIRAClient]:
+    """Return a client for the source of worklogs specified in *config*, caching responses if *cache* is True."""
     if config.tempo_token:
-        return get_tempo_client(config)
+        return get_tempo_client(config, cache=cache)
     return JIRAClient(config)
 
 
-def get_worklogs(config: SourceJiraConfig, since: arrow.Arrow, all_users: bool = False) -> Iterator[Worklog]:
+def get_worklogs(
+    config: SourceJiraConfig, since: datetime, all_users: bool = False, cache: bool = True
+) -> Iterator[Worklog]:
     """Yield user's recent worklogs.
 
     :param config: JIRA configuration
     :param since: earliest start time of yielded worklogs
     :param all_users: if True, yield also worklogs from other users if available
+    :param cache: if False, don't read or write cached responses
     """
-    for worklog in get_client(config).get_worklogs(
+    for worklog in get_client(config, cache=cache).get_worklogs(
         from_date=since.date(),
         single_user=not all_users,
     ):
@@ -269,26 +832,76 @@ def get_worklogs(config: SourceJiraConfig, since: arrow.Arrow, all_users: bool =
         yield worklog
 
 
+def get_cached_worklogs(config: SourceJiraConfig, since: datetime, cache: Optional[WorklogCache]) -> List[Worklog]:
+    """Return user's recent worklogs, reusing those fetched since the same day if they are cached.
+
+    :param config: JIRA configuration
+    :param since: earliest start time of returned worklogs
+    :param cache: cache of worklogs, disabled if its TTL is not positive; if None, no responses are cached either
+    """
+    if cache is None:
+        return list(get_worklogs(config, since, cache=False))
+    if cache.ttl <= 0:
+        return list(get_worklogs(config, since))
+    # The key is hashed, so credentials in the configuration are not written to the disk.
+    key = "{0}\n{1}".format(config.model_dump_json(), since.date())
+    worklogs = cache.get(key)
+    if worklogs is None:
+        worklogs = list(get_worklogs(config, since))
+        cache.set(key, worklogs)
+        return worklogs
+    return [worklog for worklog in worklogs if worklog.started >= since]
+
+
+@functools.lru_cache(maxsize=1024)
 def format_time(seconds: int) -> str:
     """Return *seconds* in a human-readable format (e.g. 25h 15m 45s).
 
     Unlike `timedelta`, we don't aggregate it into days: it's not useful when reporting logged work hours.
     """
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
     out = []
-    if seconds > 3599:
-        out.append("%sh" % (seconds // 3600))
-        seconds = seconds % 3600
-    if seconds > 59:
-        out.append("%sm" % (seconds // 60))
-        seconds = seconds % 60
-    if seconds > 0:
-        out.append("%ss" % seconds)
+    if hours:
+        out.append(f"{hours}h")
+    if minutes:
+        out.append(f"{minutes}m")
+    if seconds:
+        out.append(f"{seconds}s")
     return " ".join(out)
 
 
-AUTO_WORKLOG = re.compile(r"TIMEMACHINE_WID (?P<id>\d+).*")
+AUTO_WORKLOG = re.compile(r"TIMEMACHINE_WID (\d+)")
 """Regexp to detect the automatic worklog in Destination JIRA."""
 
+AUTO_WORKLOG_PREFIX = "TIMEMACHINE_WID "
+"""Prefix of automatic worklog descriptions, followed by the source worklog ID."""
+
+
+def worklog_description(worklog: Worklog) -> str:
+    """Return the automatic worklog description for the source *worklog*, with its ISO 8601 start time."""
+    return (
+        f"{AUTO_WORKLOG_PREFIX}{worklog.id}: {worklog.author} spent {worklog.time_spent_seconds}s on {worklog.issue} "
+        f"at {worklog.started.isoformat()}"
+    )
+
+
+def parse_worklog_id(description: str) -> Optional[int]:
+    """Return the source worklog ID from an automatic worklog *description*, or None if it's not automatic.
+
+    Descriptions written by the timemachine are parsed without the regexp, ``AUTO_WORKLOG`` is used for other ones.
+    """
+    if not description.startswith(AUTO_WORKLOG_PREFIX):
+        return None
+    end = description.find(" ", len(AUTO_WORKLOG_PREFIX))
+    worklog_id = description[len(AUTO_WORKLOG_PREFIX) : end if end != -1 else None].rstrip(":")
+    if worklog_id.isdecimal():
+        return int(worklog_id)
+    match = AUTO_WORKLOG.match(description)
+    if not match:
+        return None
+    return int(match.group(1))
+
 
 def match_worklog(source_worklogs: Dict[int, Worklog], worklog: Worklog) -> Optional[Worklog]:
     """Return a matching source worklog for the given destination worklog.
@@ -299,15 +912,11 @@ def match_worklog(source_worklogs: Dict[int, Worklog], worklog: Worklog) -> Opti
     :returns: a worklog from *source_worklogs* that was previously copied into the destination JIRA as *worklog*, or
         None if *worklog* has no corresponding source worklog
     """
-    match = AUTO_WORKLOG.match(worklog.description)
-    if not match:
-        return None
-    worklog_id = int(match.groupdict()["id"])
-    try:
-        return source_worklogs[worklog_id]
-    except KeyError:
-        # might be some old worklog
+    worklog_id = parse_worklog_id(worklog.description)
+    if worklog_id is None:
         return None
+    # None might be returned for some old worklog
+    return source_worklogs.get(worklog_id)
 
 
 def get_config(ctx: click.Context, param: click.Parameter, value: IO[str]) -> Config:
@@ -326,54 +935,88 @@ def get_config(ctx: click.Context, param: click.Parameter, value: IO[str]) -> Co
 @click.command()
 @click.option("--config", help="Config path", type=click.File(), callback=get_config)
 @click.option("--days", help="How many days back to look", default=1)
-def timemachine(config: Config, days: int) -> None:
+@click.option(
+    "--cache-ttl",
+    help="Seconds for which worklogs read from the source Jira are reused by the next runs, 0 disables caching",
+    type=float,
+    default=SOURCE_CACHE_TTL,
+)
+@click.option("--no-cache", help="Don't read or write any cached worklogs or responses", is_flag=True)
+@click.option("--verbose/--quiet", help="List checked and updated worklogs", default=True)
+def timemachine(config: Config, days: int, cache_ttl: float, no_cache: bool, verbose: bool) -> None:
     """Copy worklogs from source Jira issues to the destination Jira issue."""
-    utcnow = arrow.utcnow()
-
-    # Automatic worklog message.
-    worklog_msg = "TIMEMACHINE_WID {0.id}: {0.author} spent {0.time_spent_seconds}s on {0.issue} at {0.started}"
-
-    source_worklogs = {
-        worklog.id: worklog for worklog in get_worklogs(config.source_jira, utcnow - timedelta(days=days))
-    }
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    cache = None if no_cache else WorklogCache(os.path.join(CACHE_DIRECTORY, "worklogs"), cache_ttl)
 
     # How mapping to multiple destination JIRA works: we have a default issue (config.destination_jira) and a
     # mapping from source JIRA issue to a destination JIRA issue (config_dict['issue_map']) overriding it for specific
     # issues. If a worklog is already copied into any of these issues, it might get updated there. New worklogs are
     # created as specified in the mapping. No worklogs are moved or deleted.
-    dest_issues = {config.destination_jira.issue} | set(config.issue_map.values())
-
-    # Query all recent user's worklogs and then filter by task. It should be faster than querying by issue and
-    # filtering by user if several users sync worklogs to the same issue and the user doesn't have too many worklogs in
-    # other issues (e.g. logging time to the destination Jira mostly via the timemachine).
-    destination_tempo = get_tempo_client(config.destination_jira)
-    for ccworklog in destination_tempo.get_worklogs(
-        from_date=(utcnow - timedelta(days=days)).date(),
-    ):
-        if ccworklog.issue not in dest_issues:
-            continue
-        source_worklog = match_worklog(source_worklogs, ccworklog)
-        if source_worklog is None:
-            continue
-        del source_worklogs[source_worklog.id]
-        comment = worklog_msg.format(source_worklog)
-        if ccworklog.description == comment:
-            click.echo("Nothing changed for {0}".format(ccworklog.description))
-            continue
-        click.echo("Updating worklog {0} to {1}".format(ccworklog.description, comment))
-        ccworklog.description = worklog_msg.format(source_worklog)
-        ccworklog.started = source_worklog.started
-        ccworklog.time_spent_seconds = source_worklog.time_spent_seconds
-        destination_tempo.update_worklog(ccworklog)
-
-    click.echo("Writing {0} worklogs to Destination JIRA".format(len(source_worklogs)))
-
-    with click.progressbar(source_worklogs.values(), label="Writing worklog") as worklogs:
-        for source_worklog in worklogs:
-            source_worklog.description = worklog_msg.format(source_worklog)
-            source_worklog.issue = config.issue_map.get(source_worklog.issue, config.destination_jira.issue)
-            source_worklog.author = destination_tempo.account_id
-            destination_tempo.post_worklog(source_worklog)
+    default_issue = config.destination_jira.issue
+    dest_issues = frozenset((default_issue, *config.issue_map.values()))
+
+    # Search recent user's worklogs of the destination issues, so Tempo filters both by issue and by user. Worklogs of
+    # other issues are still skipped in case Tempo returns any of them.
+    destination_tempo = get_tempo_client(config.destination_jira, cache=not no_cache)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # Source worklogs are read concurrently with destination ones, which are matched once both are read.
+        source_future = executor.submit(get_cached_worklogs, config.source_jira, since, cache)
+        destination_worklogs = [
+            ccworklog
+            for ccworklog in destination_tempo.get_worklogs(from_date=since.date(), issue_keys=sorted(dest_issues))
+            if ccworklog.issue in dest_issues
+        ]
+        source_worklogs = {worklog.id: worklog for worklog in source_future.result()}
+
+        # Messages are written at once, click.echo flushes the output after each of them.
+        messages: List[str] = []
+        updates = []
+        for ccworklog in destination_worklogs:
+            worklog_id = parse_worklog_id(ccworklog.description)
+            if worklog_id is None:
+                continue
+            # Matched worklogs are removed, so the remaining ones are posted as new worklogs.
+            source_worklog = source_worklogs.pop(worklog_id, None)
+            if source_worklog is None:
+                # might be some old worklog
+                continue
+            comment = worklog_description(source_worklog)
+            if ccworklog.description == comment:
+                if verbose:
+                    messages.append("Nothing changed for {0}".format(ccworklog.description))
+                continue
+            if verbose:
+                messages.append("Updating worklog {0} to {1}".format(ccworklog.description, comment))
+            ccworklog.description = comment
+            ccworklog.started = source_worklog.started
+            ccworklog.time_spent_seconds = source_worklog.time_spent_seconds
+            updates.append(executor.submit(destination_tempo.update_worklog, ccworklog))
+        if messages:
+            click.echo("\n".join(messages))
+
+        click.echo("Writing {0} worklogs to Destination JIRA".format(len(source_worklogs)))
+
+        issue_map_get = config.issue_map.get
+        # Fields shared by all new worklogs, the others are set as Worklog.to_tempo does.
+        base = {"attributes": TEMPO_ATTRIBUTES, "authorAccountId": destination_tempo.account_id}
+        posts = []
+        for source_worklog in source_worklogs.values():
+            started = source_worklog.started.isoformat()
+            tempo_dict = {
+                **base,
+                "description": worklog_description(source_worklog),
+                "issueKey": issue_map_get(source_worklog.issue, default_issue),
+                "startDate": started[:10],
+                "startTime": started[11:19],
+                "timeSpentSeconds": source_worklog.time_spent_seconds,
+            }
+            posts.append(executor.submit(destination_tempo.post_tempo_dict, tempo_dict))
+        # Updates are still running while new worklogs are posted, their progress is shown together. Failed writes
+        # raise their errors from result().
+        with click.progressbar(length=len(updates) + len(posts), label="Writing worklog") as progress:
+            for future in as_completed(updates + posts):
+                future.result()
+                progress.update(1)
 
 
 @click.command()
@@ -382,21 +1025,16 @@ def timemachine(config: Config, days: int) -> None:
     "--since", help="Date from which to start listing (defaults to the start of the current month)", default=""
 )
 @click.option("--pm", "is_pm", help="Show time spent by all users", type=bool, default=False, is_flag=True)
-def timecheck(config: Config, since: str, is_pm: bool) -> None:
+@click.option("--no-cache", help="Don't read or write any cached responses", is_flag=True)
+def timecheck(config: Config, since: str, is_pm: bool, no_cache: bool) -> None:
     """List time spent per day and overall on the source JIRA."""
-    start = arrow.get(since) if since else arrow.utcnow().floor("month")
-    total = 0
+    start = (arrow.get(since) if since else arrow.utcnow().floor("month")).datetime
+    day_sums: DefaultDict[Tuple[date, str], int] = defaultdict(int)
 
-    def worklog_key(worklog: Worklog) -> Tuple[date, str]:
-        """Return the worklog grouping key."""
-        return (worklog.started.date(), worklog.author)
+    for worklog in get_worklogs(config.source_jira, start, all_users=is_pm, cache=not no_cache):
+        day_sums[(worklog.started.date(), worklog.author)] += worklog.time_spent_seconds
 
-    for (day, author), worklogs in itertools.groupby(
-        sorted(get_worklogs(config.source_jira, start, all_users=is_pm), key=worklog_key),
-        worklog_key,
-    ):
-        day_sum = sum(worklog.time_spent_seconds for worklog in worklogs)
-        total += day_sum
+    for (day, author), day_sum in sorted(day_sums.items()):
         click.echo("{} {} spent {}".format(day, author, format_time(day_sum)))
 
-    click.echo("Total {}".format(format_time(total)))
+    click.echo("Total {}".format(format_time(sum(day_sums.values()))))
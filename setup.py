@@ -1,5 +0,0 @@
-"""Old installation module."""
-
-from setuptools import setup  # type: ignore
-
-setup()
@@ -1,15 +1,49 @@
 """Tests not using external services."""
 
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from io import StringIO
 from unittest.mock import Mock, call, patch
 
 import arrow
 import click
+import jira
 import pytest
+import requests
+from click.testing import CliRunner
 from pydantic import HttpUrl, TypeAdapter
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError
 
-from jira_timemachine import SourceJiraConfig, Worklog, format_time, get_config, get_worklogs, match_worklog
+from jira_timemachine import (
+    MAX_WORKERS,
+    BearerAuth,
+    JIRAClient,
+    RateLimiter,
+    ResponseCache,
+    SourceJiraConfig,
+    TempoClient,
+    TempoRetry,
+    Worklog,
+    WorklogCache,
+    format_time,
+    get_cached_worklogs,
+    get_config,
+    get_tempo_client,
+    get_worklogs,
+    make_session,
+    map_bounded,
+    match_worklog,
+    parse_worklog_id,
+    prefetch,
+    response_cache,
+    timecheck,
+    timemachine,
+    worklog_description,
+)
 
 
 def test_worklog_to_tempo():
@@ -17,7 +51,7 @@ def test_worklog_to_tempo():
     assert Worklog(
         id=123,
         tempo_id=456,
-        started=arrow.get("2018-11-16T15:12:13Z"),
+        started=arrow.get("2018-11-16T15:12:13Z").datetime,
         time_spent_seconds=900,
         description="Invent test data",
         author="q.atester",
@@ -33,6 +67,24 @@ def test_worklog_to_tempo():
     }
 
 
+def test_worklog_description():
+    """Test describing a copied worklog, the description must stay the same to update worklogs copied earlier."""
+    assert (
+        worklog_description(
+            Worklog(
+                id=123,
+                tempo_id=456,
+                started=arrow.get("2018-11-16T15:12:13Z").datetime,
+                time_spent_seconds=900,
+                description="Invent test data",
+                author="q.atester",
+                issue="X-11",
+            )
+        )
+        == "TIMEMACHINE_WID 123: q.atester spent 900s on X-11 at 2018-11-16T15:12:13+00:00"
+    )
+
+
 @pytest.mark.parametrize(
     "all_users, single_user",
     (
@@ -45,12 +97,18 @@ def test_get_worklogs(all_users, single_user):
     url_adapter: TypeAdapter[HttpUrl] = TypeAdapter(HttpUrl)
     old_sample_worklogs = [
         Worklog(
-            id=1, tempo_id=2, started=arrow.get("2018-11-10"), time_spent_seconds=1, description="", author="", issue=""
+            id=1,
+            tempo_id=2,
+            started=arrow.get("2018-11-10").datetime,
+            time_spent_seconds=1,
+            description="",
+            author="",
+            issue="",
         ),
         Worklog(
             id=1,
             tempo_id=2,
-            started=arrow.get("2018-11-11"),
+            started=arrow.get("2018-11-11").datetime,
             time_spent_seconds=1,
             description="",
             author="",
@@ -61,7 +119,7 @@ def test_get_worklogs(all_users, single_user):
         Worklog(
             id=1,
             tempo_id=2,
-            started=arrow.get("2018-11-16"),
+            started=arrow.get("2018-11-16").datetime,
             time_spent_seconds=1,
             description="",
             author="",
@@ -70,7 +128,7 @@ def test_get_worklogs(all_users, single_user):
         Worklog(
             id=1,
             tempo_id=2,
-            started=arrow.get("2018-11-17"),
+            started=arrow.get("2018-11-17").datetime,
             time_spent_seconds=1,
             description="",
             author="",
@@ -86,14 +144,523 @@ def test_get_worklogs(all_users, single_user):
     )
     with patch("jira_timemachine.get_client") as mock_get_client:
         mock_get_client.return_value.get_worklogs.return_value = iter(old_sample_worklogs + recent_sample_worklogs)
-        assert list(get_worklogs(config, arrow.get("2018-11-16"), all_users)) == recent_sample_worklogs
+        assert list(get_worklogs(config, arrow.get("2018-11-16").datetime, all_users)) == recent_sample_worklogs
 
     assert mock_get_client.mock_calls == [
-        call(config),
+        call(config, cache=True),
         call().get_worklogs(from_date=date(2018, 11, 16), single_user=single_user),
     ]
 
 
+def test_bearer_auth():
+    """Test that BearerAuth sets the authorization header of a request."""
+    request = requests.Request("GET", "https://api.tempo.io/").prepare()
+    assert BearerAuth("magic")(request).headers["Authorization"] == "Bearer magic"
+
+
+def test_rate_limiter():
+    """Test that RateLimiter allows a burst of requests and then waits for further tokens."""
+    with patch("time.monotonic", return_value=100.0), patch("time.sleep") as mock_sleep:
+        limiter = RateLimiter(2)
+        for _ in range(4):
+            limiter.acquire()
+
+    assert mock_sleep.mock_calls == [call(0.5), call(1.0)]
+
+
+def test_make_session():
+    """Test that sessions keep enough connections for concurrent requests and retry server errors."""
+    adapter = make_session().get_adapter("https://api.tempo.io/")
+    assert isinstance(adapter, HTTPAdapter)
+    assert adapter.poolmanager.connection_pool_kw["maxsize"] >= MAX_WORKERS
+    assert adapter.max_retries.total == 3
+    assert adapter.max_retries.status_forcelist == (429, 500, 502, 503, 504)
+    assert adapter.max_retries.respect_retry_after_header
+    assert not adapter.max_retries.raise_on_status
+
+
+def test_tempo_retry():
+    """Test that TempoRetry pauses as required by Tempo and retries POST requests only when rate limited."""
+    retry = TempoRetry(total=3, backoff_factor=5, status_forcelist=(429, 500))
+    assert retry.is_retry("GET", 500)
+    assert retry.is_retry("POST", 429)
+    assert not retry.is_retry("POST", 500)
+    pauses = []
+    for _ in range(3):
+        retry = retry.increment("GET", "/", error=ProtocolError())
+        pauses.append(retry.get_backoff_time())
+    assert pauses == [5, 10, 15]
+
+
+def test_tempo_retry_backoff_max():
+    """Test that TempoRetry pauses no longer than its maximum backoff."""
+    retry = TempoRetry(total=5, backoff_factor=5, backoff_max=12, status_forcelist=(500,))
+    for _ in range(3):
+        retry = retry.increment("GET", "/", error=ProtocolError())
+    assert retry.get_backoff_time() == 12
+
+
+def tempo_worklog_json(worklog_id, author="q.atester"):
+    """Return a sample worklog JSON object as returned by Tempo API."""
+    return {
+        "jiraWorklogId": worklog_id,
+        "tempoWorklogId": worklog_id + 1000,
+        "author": {"accountId": author},
+        "startDate": "2018-11-16",
+        "startTime": "15:12:13",
+        "timeSpentSeconds": 900,
+        "issue": {"key": "X-11"},
+        "description": "Invent test data",
+    }
+
+
+def test_tempo_client_get_worklogs():
+    """Test that TempoClient reads all pages of the user's worklogs."""
+    mock_session = Mock()
+    client = TempoClient("magic", "q.atester", session=mock_session)
+    mock_session.get.return_value.json.side_effect = [
+        {
+            "results": [tempo_worklog_json(1), tempo_worklog_json(2, author="someone.else")],
+            "metadata": {"next": "https://api.tempo.io/next"},
+        },
+        {"results": [tempo_worklog_json(3)], "metadata": {}},
+    ]
+    worklogs = list(client.get_worklogs(date(2018, 11, 16)))
+
+    assert worklogs == [
+        Worklog(
+            id=1,
+            tempo_id=1001,
+            started=arrow.get("2018-11-16T15:12:13Z").datetime,
+            time_spent_seconds=900,
+            description="Invent test data",
+            author="q.atester",
+            issue="X-11",
+        ),
+        Worklog(
+            id=3,
+            tempo_id=1003,
+            started=arrow.get("2018-11-16T15:12:13Z").datetime,
+            time_spent_seconds=900,
+            description="Invent test data",
+            author="q.atester",
+            issue="X-11",
+        ),
+    ]
+    assert mock_session.get.call_args_list[0].args == (
+        "https://api.tempo.io/core/3/worklogs/user/q.atester?from=2018-11-16&to=%s&limit=1000" % date.today(),
+    )
+    assert mock_session.get.call_args.args == ("https://api.tempo.io/next",)
+
+
+def test_response_cache(tmp_path):
+    """Test that ResponseCache returns cached responses."""
+    cache = ResponseCache(str(tmp_path / "cache"))
+    assert cache.get("https://api.tempo.io/a") is None
+    cache.set("https://api.tempo.io/a", '"abc"', b'{"results": []}')
+    assert cache.get("https://api.tempo.io/a") == ('"abc"', b'{"results": []}')
+    assert cache.get("https://api.tempo.io/b") is None
+
+
+def test_response_cache_expiry(tmp_path):
+    """Test that ResponseCache removes expired responses when caching new ones, keeping subdirectories."""
+    cache = ResponseCache(str(tmp_path), max_age=3600)
+    cache.set("https://api.tempo.io/a", '"abc"', b"{}")
+    (tmp_path / "worklogs").mkdir()
+    with patch("time.time", return_value=time.time() + 3600):
+        cache.set("https://api.tempo.io/b", '"def"', b"{}")
+        assert cache.get("https://api.tempo.io/a") is None
+        assert cache.get("https://api.tempo.io/b") == ('"def"', b"{}")
+    assert {path.name for path in tmp_path.iterdir()} == {
+        os.path.basename(cache._path("https://api.tempo.io/b")),
+        "worklogs",
+    }
+
+
+def test_response_cache_unwritable(tmp_path, capsys):
+    """Test that ResponseCache reports an unwritable directory once and stops writing to it."""
+    (tmp_path / "cache").write_text("")
+    cache = ResponseCache(str(tmp_path / "cache"))
+    with patch("jira_timemachine.remove_expired_files") as mock_remove:
+        cache.set("https://api.tempo.io/a", '"abc"', b"{}")
+        cache.set("https://api.tempo.io/b", '"def"', b"{}")
+
+    assert capsys.readouterr().err.count("Cannot cache responses") == 1
+    assert cache.get("https://api.tempo.io/a") is None
+    mock_remove.assert_not_called()
+
+
+def test_worklog_cache(tmp_path):
+    """Test that WorklogCache returns cached worklogs until they expire."""
+    worklog = Worklog(
+        id=1,
+        tempo_id=2,
+        started=arrow.get("2018-11-16T15:12:13Z").datetime,
+        time_spent_seconds=900,
+        description="Invent test data",
+        author="q.atester",
+        issue="X-11",
+    )
+    cache = WorklogCache(str(tmp_path / "cache"), 300)
+    assert cache.get("a") is None
+    cache.set("a", [worklog])
+    assert cache.get("a") == [worklog]
+    assert cache.get("b") is None
+    with patch("time.time", return_value=time.time() + 300):
+        assert cache.get("a") is None
+
+
+def test_worklog_cache_expiry(tmp_path):
+    """Test that WorklogCache removes expired worklog lists when caching new ones."""
+    cache = WorklogCache(str(tmp_path), 300)
+    cache.set("a", [])
+    with patch("time.time", return_value=time.time() + 300):
+        cache.set("b", [])
+        assert cache.get("a") is None
+        assert cache.get("b") == []
+    assert [path.name for path in tmp_path.iterdir()] == [os.path.basename(cache._path("b"))]
+
+
+@pytest.mark.parametrize(
+    "rows",
+    (
+        [{"id": 1}],
+        [{"id": 1, "started": "2018-11-16T15:12:13+00:00"}],
+        [{"id": 1, "started": "yesterday"}],
+        "not a list of worklogs",
+    ),
+)
+def test_worklog_cache_invalid(tmp_path, rows):
+    """Test that WorklogCache ignores worklog lists it cannot read."""
+    cache = WorklogCache(str(tmp_path), 300)
+    cache.set("a", [])
+    with open(cache._path("a"), "w") as cache_file:
+        json.dump(rows, cache_file)
+    assert cache.get("a") is None
+
+
+def test_get_cached_worklogs(tmp_path):
+    """Test that get_cached_worklogs fetches worklogs once and filters cached ones by start time."""
+    url_adapter: TypeAdapter[HttpUrl] = TypeAdapter(HttpUrl)
+    config = SourceJiraConfig(
+        url=url_adapter.validate_python("https://jira.invalid/"),
+        email="user@domain.invalid",
+        jira_token="magic",
+        tempo_token="",
+        project_key="X",
+    )
+    worklogs = [
+        Worklog(
+            id=worklog_id,
+            tempo_id=None,
+            started=arrow.get(started).datetime,
+            time_spent_seconds=900,
+            description="",
+            author="q.atester",
+            issue="X-11",
+        )
+        for worklog_id, started in ((1, "2018-11-16T10:00:00Z"), (2, "2018-11-16T12:00:00Z"))
+    ]
+    cache = WorklogCache(str(tmp_path / "cache"), 300)
+    with patch("jira_timemachine.get_worklogs", return_value=iter(worklogs)) as mock_get_worklogs:
+        assert get_cached_worklogs(config, arrow.get("2018-11-16T09:00:00Z").datetime, cache) == worklogs
+        assert get_cached_worklogs(config, arrow.get("2018-11-16T11:00:00Z").datetime, cache) == worklogs[1:]
+    mock_get_worklogs.assert_called_once()
+
+
+def test_tempo_client_search_worklogs():
+    """Test that TempoClient searches worklogs of specific issues."""
+    mock_session = Mock()
+    mock_session.post.return_value.json.return_value = {"results": [tempo_worklog_json(1)], "metadata": {}}
+    client = TempoClient("magic", "q.atester", session=mock_session)
+
+    assert [worklog.id for worklog in client.get_worklogs(date(2018, 11, 16), issue_keys=["X-11", "X-12"])] == [1]
+    assert mock_session.post.call_args.args == ("https://api.tempo.io/core/3/worklogs/search?limit=1000",)
+    assert mock_session.post.call_args.kwargs["json"] == {
+        "from": "2018-11-16",
+        "to": str(date.today()),
+        "issue": ["X-11", "X-12"],
+        "authorIds": ["q.atester"],
+    }
+    mock_session.get.assert_not_called()
+
+
+def test_tempo_client_not_modified(tmp_path):
+    """Test that TempoClient revalidates cached pages and uses them if not modified."""
+    cache = ResponseCache(str(tmp_path))
+    url = "https://api.tempo.io/core/3/worklogs/user/q.atester?from=2018-11-16&to=%s&limit=1000" % date.today()
+    cache.set(url, '"abc"', json.dumps({"results": [tempo_worklog_json(1)], "metadata": {}}).encode())
+    mock_session = Mock()
+    mock_session.get.return_value.status_code = 304
+    client = TempoClient("magic", "q.atester", session=mock_session, cache=cache)
+
+    assert [worklog.id for worklog in client.get_worklogs(date(2018, 11, 16))] == [1]
+    assert mock_session.get.call_args.kwargs["headers"] == {"If-None-Match": '"abc"'}
+    mock_session.get.return_value.json.assert_not_called()
+
+
+def test_tempo_client_update_worklog():
+    """Test that TempoClient updates a worklog by its Tempo ID."""
+    mock_session = Mock()
+    client = TempoClient("magic", "q.atester", session=mock_session)
+    worklog = Worklog(
+        id=123,
+        tempo_id=456,
+        started=arrow.get("2018-11-16T15:12:13Z").datetime,
+        time_spent_seconds=900,
+        description="Invent test data",
+        author="q.atester",
+        issue="X-11",
+    )
+    client.update_worklog(worklog)
+
+    assert mock_session.put.call_args.args == ("https://api.tempo.io/core/3/worklogs/456",)
+    assert mock_session.put.call_args.kwargs["json"] == worklog.to_tempo()
+
+
+def test_tempo_client_post_worklog_error():
+    """Test that TempoClient reports and raises errors of posting worklogs."""
+    mock_session = Mock()
+    mock_session.post.return_value.raise_for_status.side_effect = requests.HTTPError("400 Client Error")
+    client = TempoClient("magic", "q.atester", session=mock_session)
+
+    with pytest.raises(requests.HTTPError):
+        client.post_tempo_dict({"issueKey": "X-11"})
+
+
+def make_jira_client():
+    """Return a JIRAClient using a mock Jira connection."""
+    url_adapter: TypeAdapter[HttpUrl] = TypeAdapter(HttpUrl)
+    config = SourceJiraConfig(
+        url=url_adapter.validate_python("https://jira.invalid/"),
+        email="user@domain.invalid",
+        jira_token="magic",
+        tempo_token="",
+        project_key="X",
+    )
+    with patch("jira.JIRA") as mock_jira, patch.dict("jira_timemachine.ACCOUNT_IDS", clear=True):
+        mock_jira.return_value.myself.return_value = {"accountId": "q.atester"}
+        mock_jira.return_value._is_cloud = False
+        client = JIRAClient(config)
+    assert client._jira is mock_jira.return_value
+    return client
+
+
+def test_get_tempo_client_shared_session():
+    """Test that Tempo clients share a session and authenticate with their own tokens."""
+    url_adapter: TypeAdapter[HttpUrl] = TypeAdapter(HttpUrl)
+    configs = [
+        SourceJiraConfig(
+            url=url_adapter.validate_python(url),
+            email="user@domain.invalid",
+            jira_token="magic",
+            tempo_token=token,
+            project_key="X",
+        )
+        for url, token in (("https://source.invalid/", "a"), ("https://destination.invalid/", "b"))
+    ]
+    with patch("jira_timemachine.BaseJIRAClient"), patch.dict("jira_timemachine.TEMPO_CLIENTS", clear=True):
+        source, destination = [get_tempo_client(config) for config in configs]
+
+    assert source.session is destination.session
+    assert (source.auth.token, destination.auth.token) == ("a", "b")
+
+
+def test_get_tempo_client_same_user():
+    """Test that configurations with the same Tempo token and user share a Tempo client and its rate limit."""
+    url_adapter: TypeAdapter[HttpUrl] = TypeAdapter(HttpUrl)
+    config = SourceJiraConfig(
+        url=url_adapter.validate_python("https://jira.invalid/"),
+        email="user@domain.invalid",
+        jira_token="magic",
+        tempo_token="a",
+        project_key="X",
+    )
+    with (
+        patch("jira_timemachine.BaseJIRAClient") as mock_jira_client,
+        patch.dict("jira_timemachine.TEMPO_CLIENTS", clear=True),
+    ):
+        mock_jira_client.return_value.account_id = "q.atester"
+        assert get_tempo_client(config) is get_tempo_client(config)
+        mock_jira_client.return_value.account_id = "someone.else"
+        assert get_tempo_client(config).account_id == "someone.else"
+
+
+def test_get_tempo_client_no_cache():
+    """Test that Tempo clients created without caching don't share the response cache."""
+    url_adapter: TypeAdapter[HttpUrl] = TypeAdapter(HttpUrl)
+    config = SourceJiraConfig(
+        url=url_adapter.validate_python("https://jira.invalid/"),
+        email="user@domain.invalid",
+        jira_token="magic",
+        tempo_token="a",
+        project_key="X",
+    )
+    with patch("jira_timemachine.BaseJIRAClient"), patch.dict("jira_timemachine.TEMPO_CLIENTS", clear=True):
+        assert get_tempo_client(config, cache=False).cache is None
+        assert get_tempo_client(config).cache is response_cache()
+
+
+def test_jira_client_account_id_cache():
+    """Test that the account ID is requested once for the same credentials."""
+    url_adapter: TypeAdapter[HttpUrl] = TypeAdapter(HttpUrl)
+    config = SourceJiraConfig(
+        url=url_adapter.validate_python("https://jira.invalid/"),
+        email="user@domain.invalid",
+        jira_token="magic",
+        tempo_token="",
+        project_key="X",
+    )
+    with patch("jira.JIRA") as mock_jira, patch.dict("jira_timemachine.ACCOUNT_IDS", clear=True):
+        mock_jira.return_value.myself.return_value = {"accountId": "q.atester"}
+        assert JIRAClient(config).account_id == "q.atester"
+        assert JIRAClient(config).account_id == "q.atester"
+
+    assert mock_jira.call_count == 1
+
+
+def jira_worklog_json(worklog_id, issue_id, author="q.atester"):
+    """Return a sample worklog JSON object as returned by Jira API."""
+    return {
+        "id": str(worklog_id),
+        "issueId": issue_id,
+        "author": {"accountId": author},
+        "started": "2018-11-16T15:12:13.000+0000",
+        "timeSpentSeconds": 900,
+        "comment": "Invent test data",
+    }
+
+
+def test_jira_client_bulk_worklogs():
+    """Test that JIRAClient reads worklogs of project issues using the bulk worklog endpoints."""
+    client = make_jira_client()
+    client._jira._session.get.return_value.json.side_effect = [
+        {"values": [{"worklogId": 1}, {"worklogId": 2}], "lastPage": False, "nextPage": "https://jira.invalid/next"},
+        {"values": [{"worklogId": 3}, {"worklogId": 4}], "lastPage": True},
+    ]
+    client._jira._get_json.return_value = [
+        jira_worklog_json(1, "10"),
+        jira_worklog_json(2, "11"),
+        jira_worklog_json(3, "10", author="someone.else"),
+        jira_worklog_json(4, "12"),
+    ]
+    issue = Mock(id="10", key="X-11")
+    with patch.object(client, "_issues", return_value=iter([issue])) as mock_issues:
+        worklogs = list(client.get_worklogs(date(2018, 11, 16)))
+
+    assert worklogs == [
+        Worklog(
+            id=1,
+            tempo_id=None,
+            started=arrow.get("2018-11-16T15:12:13Z").datetime,
+            time_spent_seconds=900,
+            description="Invent test data",
+            author="q.atester",
+            issue="X-11",
+        ),
+    ]
+    assert client._jira._session.get.mock_calls[0] == call(
+        client._jira._get_url.return_value, params={"since": 1542326400000}
+    )
+    assert client._jira._session.get.mock_calls[2] == call("https://jira.invalid/next", params=None)
+    client._jira._get_json.assert_called_once_with("worklog/list", params={"ids": [1, 2, 3, 4]}, use_post=True)
+    mock_issues.assert_called_once_with("project = X AND id in (10, 11, 12)", use_post=True)
+
+
+def test_jira_client_bulk_worklogs_issue_keys():
+    """Test that JIRAClient resolves each issue key once for all worklog batches."""
+    client = make_jira_client()
+    client._jira._session.get.return_value.json.return_value = {
+        "values": [{"worklogId": 1}, {"worklogId": 2}, {"worklogId": 3}, {"worklogId": 4}],
+        "lastPage": True,
+    }
+    client._jira._get_json.side_effect = [
+        [jira_worklog_json(1, "10"), jira_worklog_json(2, "11")],
+        [jira_worklog_json(3, "10"), jira_worklog_json(4, "11")],
+    ]
+    with (
+        patch.object(JIRAClient, "_WORKLOG_LIST_BATCH", 2),
+        patch.object(client, "_issues", return_value=iter([Mock(id="10", key="X-11")])) as mock_issues,
+    ):
+        worklogs = list(client.get_worklogs(date(2018, 11, 16)))
+
+    assert [worklog.id for worklog in worklogs] == [1, 3]
+    assert client._jira._get_json.mock_calls == [
+        call("worklog/list", params={"ids": [1, 2]}, use_post=True),
+        call("worklog/list", params={"ids": [3, 4]}, use_post=True),
+    ]
+    mock_issues.assert_called_once_with("project = X AND id in (10, 11)", use_post=True)
+
+
+def test_jira_client_issues_page_size():
+    """Test that JIRAClient continues with the page size limited by Jira, requesting the other pages concurrently."""
+    client = make_jira_client()
+    issue_keys = ["X-1", "X-2", "X-3", "X-4", "X-5"]
+    client._jira.search_issues.side_effect = lambda startAt, maxResults, **kwargs: jira.client.ResultList(
+        issue_keys[startAt : startAt + min(maxResults, 2)], _total=len(issue_keys)
+    )
+
+    assert list(client._issues("project = X")) == issue_keys
+    assert sorted(
+        (mock_call.kwargs["startAt"], mock_call.kwargs["maxResults"])
+        for mock_call in client._jira.search_issues.mock_calls
+    ) == [(0, 1000), (2, 2), (4, 2)]
+
+
+def test_jira_client_issues_cloud():
+    """Test that JIRAClient follows next page tokens when listing issues in Jira Cloud."""
+    client = make_jira_client()
+    client._jira._is_cloud = True
+    client._jira.enhanced_search_issues.side_effect = [
+        jira.client.ResultList(["X-1", "X-2"], _nextPageToken="next"),
+        jira.client.ResultList(["X-3"]),
+    ]
+
+    assert list(client._issues("project = X")) == ["X-1", "X-2", "X-3"]
+    assert [mock_call.kwargs["nextPageToken"] for mock_call in client._jira.enhanced_search_issues.mock_calls] == [
+        None,
+        "next",
+    ]
+    client._jira.search_issues.assert_not_called()
+
+
+def test_jira_client_issues_last_page():
+    """Test that JIRAClient stops requesting issues after the last page."""
+    client = make_jira_client()
+    client._jira.search_issues.return_value = jira.client.ResultList(["X-1", "X-2"], _total=2)
+
+    assert list(client._issues("project = X")) == ["X-1", "X-2"]
+    client._jira.search_issues.assert_called_once()
+    assert client._jira.search_issues.call_args.kwargs["use_post"] is False
+
+
+def test_jira_client_issues_use_post():
+    """Test that JIRAClient sends long queries in the body of POST requests."""
+    client = make_jira_client()
+    client._jira.search_issues.return_value = jira.client.ResultList(["X-1"], _total=1)
+    assert list(client._issues("project = X AND id in (1, 2)", use_post=True)) == ["X-1"]
+    client._jira._is_cloud = True
+    client._jira.enhanced_search_issues.return_value = jira.client.ResultList(["X-1"])
+    assert list(client._issues("project = X AND id in (1, 2)", use_post=True)) == ["X-1"]
+
+    assert client._jira.search_issues.call_args.kwargs["use_post"] is True
+    assert client._jira.enhanced_search_issues.call_args.kwargs["use_post"] is True
+
+
+def test_jira_client_worklogs_fallback():
+    """Test that JIRAClient reads worklogs per issue if the bulk worklog endpoints are not permitted."""
+    client = make_jira_client()
+    client._jira._session.get.side_effect = jira.JIRAError(status_code=403)
+    client._jira.worklogs.return_value = [Mock(raw=jira_worklog_json(1, "10"))]
+    issue = Mock(id="10", key="X-11")
+    with patch.object(client, "_issues", return_value=iter([issue])):
+        worklogs = list(client.get_worklogs(date(2018, 11, 16)))
+
+    assert [worklog.id for worklog in worklogs] == [1]
+    assert worklogs[0].issue == "X-11"
+    client._jira.worklogs.assert_called_once_with(issue)
+
+
 @pytest.mark.parametrize(
     "seconds, result",
     (
@@ -123,7 +690,7 @@ def test_match_worklog():
         return Worklog(
             id=i,
             tempo_id=None,
-            started=arrow.get("2018-11-10"),
+            started=arrow.get("2018-11-10").datetime,
             time_spent_seconds=1,
             description=description,
             author="",
@@ -146,6 +713,54 @@ def test_match_worklog():
     )
 
 
+@pytest.mark.parametrize(
+    "description, worklog_id",
+    (
+        ("Some original work", None),
+        ("TIMEMACHINE_WID", None),
+        ("TIMEMACHINE_WID ", None),
+        ("TIMEMACHINE_WID x", None),
+        ("TIMEMACHINE_WID 123", 123),
+        ("TIMEMACHINE_WID 123abc", 123),
+        ("TIMEMACHINE_WID 124: X spent 1440s on Y-126 at 2018-11-16T12:34:01Z", 124),
+    ),
+)
+def test_parse_worklog_id(description, worklog_id):
+    """Test parse_worklog_id on sample descriptions."""
+    assert parse_worklog_id(description) == worklog_id
+
+
+def test_prefetch():
+    """Test that prefetch yields all items in order and reraises exceptions of the producer."""
+
+    def items():
+        """Yield sample items and fail."""
+        yield from range(5)
+        raise ValueError("no more items")
+
+    prefetched = prefetch(items())
+    assert [next(prefetched) for _ in range(5)] == [0, 1, 2, 3, 4]
+    with pytest.raises(ValueError, match="no more items"):
+        next(prefetched)
+
+
+def test_map_bounded():
+    """Test that map_bounded yields results for all items while consuming them lazily."""
+    consumed = []
+
+    def items():
+        """Yield sample items, recording which were consumed."""
+        for item in range(10):
+            consumed.append(item)
+            yield item
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = map_bounded(executor, lambda item: item * 2, items(), 3)
+        first = next(results)
+        assert len(consumed) <= 4
+        assert sorted([first, *results]) == [(item, item * 2) for item in range(10)]
+
+
 def test_get_config_ok():
     """Test that a valid config is parsed."""
     config_file = StringIO(
@@ -211,3 +826,213 @@ def test_get_config_invalid():
         get_config(Mock(), Mock(), config_file)
 
     assert exc_info.value.message == ("1 validation error for Config\n" "source_jira.jira_token - Field required\n")
+
+
+def test_get_config_extra_field():
+    """Test that unknown config fields are rejected."""
+    config_file = StringIO(
+        """{
+  "source_jira": {
+    "url": "https://source.atlassian.net",
+    "email": "login@login.com",
+    "jira_token": "a",
+    "tempo_token": "b"
+  },
+  "destination_jira": {
+    "url": "https://destination.atlassian.net",
+    "email": "login@login.com",
+    "jira_token": "c",
+    "issue": "ARIJ-3",
+    "tempo_token": "d",
+    "project_key": "ARIJ"
+  }
+}"""
+    )
+    with pytest.raises(click.BadParameter) as exc_info:
+        get_config(Mock(), Mock(), config_file)
+
+    assert exc_info.value.message == (
+        "1 validation error for Config\n" "destination_jira.project_key - Extra inputs are not permitted\n"
+    )
+
+
+def test_timecheck(tmp_path):
+    """Test that timecheck sums worklogs per day and author."""
+    config_path = tmp_path / "config.json"
+    config_path.write_text(
+        json.dumps(
+            {
+                "source_jira": {"url": "https://source.atlassian.net", "jira_token": "a"},
+                "destination_jira": {
+                    "url": "https://destination.atlassian.net",
+                    "jira_token": "c",
+                    "issue": "ARIJ-3",
+                    "tempo_token": "d",
+                },
+            }
+        )
+    )
+
+    def make(started, author, seconds):
+        """Return a sample worklog instance."""
+        return Worklog(
+            id=1,
+            tempo_id=None,
+            started=arrow.get(started).datetime,
+            time_spent_seconds=seconds,
+            description="",
+            author=author,
+            issue="",
+        )
+
+    worklogs = [
+        make("2018-11-17T10:00:00Z", "b", 60),
+        make("2018-11-16T10:00:00Z", "b", 3600),
+        make("2018-11-16T12:00:00Z", "a", 1800),
+        make("2018-11-16T15:00:00Z", "b", 1800),
+    ]
+    with patch("jira_timemachine.get_worklogs", return_value=iter(worklogs)) as mock_get_worklogs:
+        result = CliRunner().invoke(timecheck, ["--config", str(config_path), "--since", "2018-11-16", "--pm"])
+
+    assert result.exit_code == 0
+    assert result.output == (
+        "2018-11-16 a spent 30m\n" "2018-11-16 b spent 1h 30m\n" "2018-11-17 b spent 1m\n" "Total 2h 1m\n"
+    )
+    assert mock_get_worklogs.call_args.kwargs == {"all_users": True, "cache": True}
+
+
+def test_timemachine(tmp_path):
+    """Test that timemachine updates changed copied worklogs and posts new ones."""
+    config_path = tmp_path / "config.json"
+    config_path.write_text(
+        json.dumps(
+            {
+                "source_jira": {"url": "https://source.atlassian.net", "jira_token": "a"},
+                "destination_jira": {
+                    "url": "https://destination.atlassian.net",
+                    "jira_token": "c",
+                    "issue": "ARIJ-3",
+                    "tempo_token": "d",
+                },
+                "issue_map": {"X-12": "ARIJ-4"},
+            }
+        )
+    )
+
+    def make(worklog_id, issue, description=""):
+        """Return a sample worklog instance."""
+        return Worklog(
+            id=worklog_id,
+            tempo_id=None,
+            started=arrow.utcnow().floor("second").datetime,
+            time_spent_seconds=60,
+            description=description,
+            author="q.atester",
+            issue=issue,
+        )
+
+    source_worklogs = [make(1, "X-11"), make(2, "X-12"), make(3, "X-11")]
+    mock_tempo = Mock(account_id="d.atester")
+    mock_tempo.get_worklogs.return_value = iter(
+        [
+            make(10, "ARIJ-3", worklog_description(source_worklogs[0])),
+            make(11, "ARIJ-3", "TIMEMACHINE_WID 3: outdated"),
+            make(12, "OTHER-1", "TIMEMACHINE_WID 2: elsewhere"),
+        ]
+    )
+    with (
+        patch("jira_timemachine.get_worklogs", return_value=iter(source_worklogs)),
+        patch("jira_timemachine.get_tempo_client", return_value=mock_tempo),
+    ):
+        result = CliRunner().invoke(timemachine, ["--config", str(config_path), "--cache-ttl", "0"])
+
+    assert result.exit_code == 0, result.output
+    assert "Nothing changed for TIMEMACHINE_WID 1: " in result.output
+    assert [mock_call.args[0].id for mock_call in mock_tempo.update_worklog.mock_calls] == [11]
+    assert mock_tempo.update_worklog.call_args.args[0].description == worklog_description(source_worklogs[2])
+    mock_tempo.post_tempo_dict.assert_called_once_with(
+        {
+            **source_worklogs[1].to_tempo(),
+            "description": worklog_description(source_worklogs[1]),
+            "issueKey": "ARIJ-4",
+            "authorAccountId": "d.atester",
+        }
+    )
+
+
+def test_timemachine_quiet(tmp_path):
+    """Test that timemachine does not list checked worklogs with --quiet."""
+    config_path = tmp_path / "config.json"
+    config_path.write_text(
+        json.dumps(
+            {
+                "source_jira": {"url": "https://source.atlassian.net", "jira_token": "a"},
+                "destination_jira": {
+                    "url": "https://destination.atlassian.net",
+                    "jira_token": "c",
+                    "issue": "ARIJ-3",
+                    "tempo_token": "d",
+                },
+            }
+        )
+    )
+    source_worklog = Worklog(
+        id=1,
+        tempo_id=None,
+        started=arrow.utcnow().floor("second").datetime,
+        time_spent_seconds=60,
+        description="",
+        author="q.atester",
+        issue="X-11",
+    )
+    copied_worklog = Worklog(
+        id=10,
+        tempo_id=1010,
+        started=source_worklog.started,
+        time_spent_seconds=60,
+        description=worklog_description(source_worklog),
+        author="d.atester",
+        issue="ARIJ-3",
+    )
+    mock_tempo = Mock(account_id="d.atester")
+    mock_tempo.get_worklogs.return_value = iter([copied_worklog])
+    with (
+        patch("jira_timemachine.get_worklogs", return_value=iter([source_worklog])),
+        patch("jira_timemachine.get_tempo_client", return_value=mock_tempo),
+    ):
+        result = CliRunner().invoke(timemachine, ["--config", str(config_path), "--cache-ttl", "0", "--quiet"])
+
+    assert result.exit_code == 0, result.output
+    assert "Nothing changed" not in result.output
+    mock_tempo.update_worklog.assert_not_called()
+
+
+def test_timemachine_no_cache(tmp_path):
+    """Test that timemachine neither caches worklogs nor responses with --no-cache."""
+    config_path = tmp_path / "config.json"
+    config_path.write_text(
+        json.dumps(
+            {
+                "source_jira": {"url": "https://source.atlassian.net", "jira_token": "a"},
+                "destination_jira": {
+                    "url": "https://destination.atlassian.net",
+                    "jira_token": "c",
+                    "issue": "ARIJ-3",
+                    "tempo_token": "d",
+                },
+            }
+        )
+    )
+    mock_tempo = Mock(account_id="d.atester")
+    mock_tempo.get_worklogs.return_value = iter([])
+    with (
+        patch("jira_timemachine.get_worklogs", return_value=iter([])) as mock_get_worklogs,
+        patch("jira_timemachine.get_tempo_client", return_value=mock_tempo) as mock_get_tempo_client,
+        patch("jira_timemachine.WorklogCache") as mock_worklog_cache,
+    ):
+        result = CliRunner().invoke(timemachine, ["--config", str(config_path), "--no-cache"])
+
+    assert result.exit_code == 0, result.output
+    assert mock_get_worklogs.call_args.kwargs == {"cache": False}
+    assert mock_get_tempo_client.call_args.kwargs == {"cache": False}
+    mock_worklog_cache.assert_not_called()